@@ -1,22 +1,28 @@
-from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from ..parameter import DataParameter, SingleDataParameter
 from ..physics import Constants
 import numpy as np
 
 
-class DataBase(ABC):
+# registry of all the data loader classes, keyed by their _DATA_TYPE
+_REGISTRY = {}
+
+
+class DataBase:
     """ Base class of data
     """
-    subclasses = {}
+    subclasses = _REGISTRY
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
-        cls.subclasses[cls._DATA_TYPE] = cls
+        _REGISTRY[cls._DATA_TYPE] = cls
+        # also register the lower case name, so the lookup is case-insensitive
+        _REGISTRY[cls._DATA_TYPE.lower()] = cls
 
-    @classmethod
-    def create(cls, data_type,  **kwargs):
-        if data_type not in cls.subclasses:
+    @staticmethod
+    def create(data_type,  **kwargs):
+        if data_type not in _REGISTRY:
             raise ValueError(f"Data type {format(data_type)} is not defined")
-        return cls.subclasses[data_type](**kwargs)
+        return _REGISTRY[data_type](**kwargs)
 
     def __init__(self, parameters=SingleDataParameter()):
         # parameters
@@ -32,23 +38,20 @@ class DataBase(ABC):
         # reference solution of the output of PINN
         self.sol = None
 
-    @abstractmethod
     def get_ice_coordinates(self, mask_name=""):
         """ get ice masks if available from the data
         """
-        pass
+        raise NotImplementedError
 
-    @abstractmethod
     def load_data(self):
         """ load data from `self.path`
         """
-        pass
+        raise NotImplementedError
 
-    @abstractmethod
     def prepare_training_data(self):
         """ prepare training data according to the `data_size`
         """
-        pass
+        raise NotImplementedError
 
 
 class Data(Constants):
@@ -58,7 +61,18 @@ class Data(Constants):
         super().__init__()
         self.parameters = parameters
         # create all instances of Data based on its source, we can have multiple data from the same source
-        self.data = {k:DataBase.create(parameters.data[k].source, parameters=parameters.data[k]) for k in parameters.data}
+        # look up the registry directly instead of going through DataBase.create for each data
+        subclasses = _REGISTRY
+        self.data = {}
+        for k in parameters.data:
+            p = parameters.data[k]
+            if p.source not in subclasses:
+                raise ValueError(f"Data type {format(p.source)} is not defined")
+            self.data[k] = subclasses[p.source](parameters=p)
+
+        # cache the keys and the instances, so the loops below skip the dict lookups
+        self._keys = tuple(self.data.keys())
+        self._data_list = tuple(self.data.values())
 
         # input to PINN
         self.X = {}
@@ -68,29 +82,45 @@ class Data(Constants):
     def get_ice_coordinates(self, mask_name=""):
         """ get the coordinates of ice covered region from all the data, put them in one array
         """
-        return np.vstack([self.data[k].get_ice_coordinates(mask_name=mask_name) for k in self.data])
+        # collect the coordinates from each data first, so that the total size is known
+        coords = [d.get_ice_coordinates(mask_name=mask_name) for d in self._data_list]
+        # fill a preallocated array by slices, rather than vstack the list
+        X = np.empty((sum(c.shape[0] for c in coords), 2), dtype=np.float64)
+        offset = 0
+        for c in coords:
+            X[offset:offset+c.shape[0]] = c
+            offset += c.shape[0]
+        return X
 
     def load_data(self):
         """ laod all the data in `self.data`
         """
-        for k in self.data:
-            self.data[k].load_data()
+        if len(self._data_list) > 1:
+            # HDF5 reads release the GIL, load the files concurrently
+            with ThreadPoolExecutor(max_workers=min(8, len(self._data_list))) as executor:
+                futures = [executor.submit(d.load_data) for d in self._data_list]
+                for f in futures:
+                    f.result()
+        else:
+            for d in self._data_list:
+                d.load_data()
 
     def prepare_training_data(self):
         """ merge all `X` and `sol` in `self.data` to `self.X` and `self.sol` with the keys
         """
         # prepare the training data according to data_size
-        for key in self.data:
-            self.data[key].prepare_training_data()
-            # merge all X and sol
-            for xkey in self.data[key].X:
-                if xkey not in self.X:
-                    self.X[xkey] = self.data[key].X[xkey]
-                else:
-                    self.X[xkey] = np.vstack((self.X[xkey], self.data[key].X[xkey]))
-
-            for xkey in self.data[key].sol:
-                if xkey not in self.sol:
-                    self.sol[xkey] = self.data[key].sol[xkey]
-                else:
-                    self.sol[xkey] = np.vstack((self.sol[xkey], self.data[key].sol[xkey]))
+        X_list = {}
+        sol_list = {}
+        for d in self._data_list:
+            d.prepare_training_data()
+            # collect all X and sol in lists
+            for xkey in d.X:
+                X_list.setdefault(xkey, []).append(d.X[xkey])
+
+            for xkey in d.sol:
+                sol_list.setdefault(xkey, []).append(d.sol[xkey])
+
+        # merge all X and sol with at most one concatenate per key,
+        # a key provided by a single data source needs no copy at all
+        self.X = {k:(v[0] if len(v) == 1 else np.concatenate(v, axis=0)) for k,v in X_list.items()}
+        self.sol = {k:(v[0] if len(v) == 1 else np.concatenate(v, axis=0)) for k,v in sol_list.items()}
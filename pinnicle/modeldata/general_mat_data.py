@@ -33,9 +33,10 @@ class MatData(DataBase, Constants):
         self.X_dict['x'] = data['x']
         self.X_dict['y'] = data['y']
 
-        # load all variables from parameters.name_map
+        # load all variables from parameters.name_map, in the precision requested by the parameters
+        dtype = np.dtype(self.parameters.dtype)
         for k in self.parameters.name_map:
-            self.data_dict[k] = data[self.parameters.name_map[k]]
+            self.data_dict[k] = np.asarray(data[self.parameters.name_map[k]], dtype=dtype)
 
     def plot(self, data_names=[], vranges={}, axs=None, **kwargs):
         """ TODO: scatter plot of the selected data from data_names
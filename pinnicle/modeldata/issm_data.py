@@ -5,6 +5,29 @@ from ..utils import plot_dict_data, load_mat
 import numpy as np
 
 
+def _gather_subsample(x, y, val, pos, out_xy=None, out_val=None):
+    """ gather the coordinates `(x[pos], y[pos])` and the values `val[pos]` of the
+        sampled points in one pass over the flat arrays, writing into the
+        preallocated outputs if they are given
+
+    Args:
+        x, y, val (np.array): flat arrays covering the full mesh
+        pos (np.array): positions of the sampled points in the flat arrays
+        out_xy (np.array): optional (len(pos), 2) output for the coordinates
+        out_val (np.array): optional (len(pos), 1) output for the values
+    Returns:
+        out_xy, out_val (np.array): the gathered coordinates and values
+    """
+    if out_xy is None:
+        out_xy = np.empty((pos.shape[0], 2), dtype=x.dtype)
+    if out_val is None:
+        out_val = np.empty((pos.shape[0], 1), dtype=val.dtype)
+    np.take(x, pos, out=out_xy[:,0])
+    np.take(y, pos, out=out_xy[:,1])
+    np.take(val, pos, out=out_val[:,0])
+    return out_xy, out_val
+
+
 class ISSMmdData(DataBase, Constants):
     """ data loaded from model in ISSM
     """
@@ -12,6 +35,13 @@ class ISSMmdData(DataBase, Constants):
     def __init__(self, parameters=SingleDataParameter()):
         Constants.__init__(self)
         super().__init__(parameters)
+        # cache of the ice indices per mask name, the masks do not change after load_data
+        self._ice_idx_cache = {}
+        # cache of the boolean `mask < 0` arrays per mask name, filled lazily
+        self._neg_mask_cache = {}
+        # per-variable output buffers, reused across repeated prepare_training_data calls
+        self._buf_X = {}
+        self._buf_sol = {}
 
     def get_ice_coordinates(self, mask_name=""):
         """ Use `get_ice_indices` defined by each individual class,
@@ -20,21 +50,23 @@ class ISSMmdData(DataBase, Constants):
             ice covered region.
         """
         iice = self.get_ice_indices(mask_name=mask_name)
-        # get the coordinates
-        X_mask = np.hstack((self.X_dict['x'][iice].flatten()[:,None],
-                            self.X_dict['y'][iice].flatten()[:,None]))
+        # get the coordinates from the raveled views, a plain 1-D take
+        X_mask = np.vstack((self._x_flat[iice],
+                            self._y_flat[iice])).T
         return X_mask
 
     def get_ice_indices(self, mask_name=""):
-        """ get the indices of ice covered region for `X_dict` and `data_dict`
+        """ get the flat indices of ice covered region for `X_dict` and `data_dict`
         """
         if (not mask_name) or (mask_name not in self.mask_dict):
             mask_name = "icemask"
 
-        # get ice mask
-        icemask = self.mask_dict[mask_name]
-        iice = np.asarray(icemask<0).nonzero()
-        return iice
+        # get ice mask, the comparison and the indices are each computed once per mask
+        if mask_name not in self._ice_idx_cache:
+            if mask_name not in self._neg_mask_cache:
+                self._neg_mask_cache[mask_name] = self.mask_dict[mask_name]<0
+            self._ice_idx_cache[mask_name] = np.flatnonzero(self._neg_mask_cache[mask_name])
+        return self._ice_idx_cache[mask_name]
 
     def load_data(self):
         """ load ISSM model from a `.mat` file
@@ -43,18 +75,30 @@ class ISSMmdData(DataBase, Constants):
         data = load_mat(self.parameters.data_path)
         # get the model
         md = data['md']
+        # invalidate the cached masks and indices from any previously loaded data
+        self._ice_idx_cache = {}
+        self._neg_mask_cache = {}
         # create the output dict
-        # x,y coordinates
-        self.X_dict['x'] = md['mesh']['x']
-        self.X_dict['y'] = md['mesh']['y']
+        # x,y coordinates, as C-contiguous arrays so ravel() below returns views
+        self.X_dict['x'] = np.ascontiguousarray(md['mesh']['x'])
+        self.X_dict['y'] = np.ascontiguousarray(md['mesh']['y'])
         # data
-        self.data_dict['u'] = md['inversion']['vx_obs']/self.yts
-        self.data_dict['v'] = md['inversion']['vy_obs']/self.yts
+        # the arrays are freshly loaded from the file, scale them in place by the
+        # reciprocal of yts to avoid allocating a second full-size array per division
+        u = md['inversion']['vx_obs']
+        u *= (1.0/self.yts)
+        self.data_dict['u'] = u
+        v = md['inversion']['vy_obs']
+        v *= (1.0/self.yts)
+        self.data_dict['v'] = v
         self.data_dict['s'] = md['geometry']['surface']
-        self.data_dict['a'] = (md['smb']['mass_balance'] - md['balancethickness']['thickening_rate'])/self.yts
+        a = md['smb']['mass_balance'] - md['balancethickness']['thickening_rate']
+        a *= (1.0/self.yts)
+        self.data_dict['a'] = a
         self.data_dict['H'] = md['geometry']['thickness']
         self.data_dict['B'] = md['materials']['rheology_B']
-        self.data_dict['vel'] = np.sqrt(self.data_dict['u']**2.0+self.data_dict['v']**2.0)
+        # np.hypot fuses the squares, sum and sqrt in a single pass without temporaries
+        self.data_dict['vel'] = np.hypot(self.data_dict['u'], self.data_dict['v'])
         # check the friction law
         if 'C' in md['friction']:
             self.data_dict['C'] = md['friction']['C'] # Weertman
@@ -69,17 +113,30 @@ class ISSMmdData(DataBase, Constants):
             N[np.where(N <= 1.0, True, False)] = 1.0
             self.data_dict['C'] = C_b*np.sqrt(N)*(self.data_dict['vel']**(1.0/3.0))
 
-        # clean up is any of the keys are empty
-        self.data_dict = {k:self.data_dict[k] for k in self.data_dict if self.data_dict[k].shape != ()}
+        # clean up is any of the keys are empty, MATLAB stores arrays in F-order, make
+        # everything C-contiguous so the comparisons and gathers hit the fast strided paths,
+        # and store in the precision requested by the parameters
+        dtype = np.dtype(self.parameters.dtype)
+        self.data_dict = {k:np.ascontiguousarray(self.data_dict[k], dtype=dtype) for k in self.data_dict if self.data_dict[k].shape != ()}
         # ice mask
-        self.mask_dict['icemask'] = md['mask']['ice_levelset']
+        self.mask_dict['icemask'] = np.ascontiguousarray(md['mask']['ice_levelset'])
         # B.C.
-        self.mask_dict['DBC_mask'] = md['mesh']['vertexonboundary']
+        self.mask_dict['DBC_mask'] = np.ascontiguousarray(md['mesh']['vertexonboundary'])
+        self._idbc = np.flatnonzero(self.mask_dict['DBC_mask']>0)
         # mesh information
         self.mesh_dict['edges'] = md['mesh']['edges']
         self.mesh_dict['elements'] = md['mesh']['elements']
         self.mesh_dict['lat'] = md['mesh']['lat']
         self.mesh_dict['long'] = md['mesh']['long']
+        # raveled views of the coordinates, indexed by the flat indices below
+        self._x_flat = self.X_dict['x'].ravel()
+        self._y_flat = self.X_dict['y'].ravel()
+        # ice covered and Dirichlet boundary coordinates only depend on X_dict and
+        # mask_dict, compute them here once instead of on every prepare_training_data
+        self._iice = self.get_ice_indices()
+        # keep them C-contiguous, so the row selection in prepare_training_data hits the fast path
+        self._X_ice = np.ascontiguousarray(np.vstack((self._x_flat[self._iice], self._y_flat[self._iice])).T)
+        self._X_bc = np.ascontiguousarray(np.vstack((self._x_flat[self._idbc], self._y_flat[self._idbc])).T)
 
     def plot(self, data_names=[], vranges={}, axs=None, resolution=200, **kwargs):
         """ use `utils.plot_dict_data` to plot the ISSM data
@@ -120,29 +177,43 @@ class ISSMmdData(DataBase, Constants):
         self.X = {}
         self.sol = {}
 
-        # prepare x,y coordinates
-        iice = self.get_ice_indices()
-        X_temp = np.hstack((self.X_dict['x'][iice].flatten()[:,None], self.X_dict['y'][iice].flatten()[:,None]))
-        max_data_size = X_temp.shape[0]
+        # ice covered and boundary coordinates, precomputed in load_data
+        iice = self._iice
+        max_data_size = self._X_ice.shape[0]
+        idbc = self._idbc
+        X_bc = self._X_bc
+        # flat views of the coordinates for the fused gather
+        x_flat = self._x_flat
+        y_flat = self._y_flat
 
-        # prepare boundary coordinates
-        DBC = self.mask_dict['DBC_mask']
-        idbc = np.asarray(DBC>0).nonzero()
-        X_bc = np.hstack((self.X_dict['x'][idbc].flatten()[:,None], self.X_dict['y'][idbc].flatten()[:,None]))
+        # draw one random permutation shared by all the variables, replace=False for no repeat data,
+        # the Generator API is faster than the legacy np.random functions
+        rng = np.random.default_rng()
+        idx_full = rng.permutation(max_data_size)
 
         # go through all keys in data_dict
         for k in self.data_dict:
             # if datasize has the key, then add to X and sol
             if k in data_size:
                 if data_size[k] is not None:
-                    # apply ice mask
-                    sol_temp = self.data_dict[k][iice].flatten()[:,None]
-                    # randomly choose, replace=False for no repeat data
-                    idx = np.random.choice(max_data_size, min(data_size[k],max_data_size), replace=False)
-                    self.X[k] = X_temp[idx, :]
-                    self.sol[k] = sol_temp[idx, :]
+                    # randomly choose by slicing the shared permutation
+                    idx = idx_full[:min(data_size[k],max_data_size)]
+                    # positions of the sampled points in the flat arrays, then gather
+                    # coordinates and values in one pass, instead of masking the whole
+                    # variable first and subsampling the result
+                    pos = np.take(iice, idx)
+                    # reuse the buffers from the previous call if the size still matches,
+                    # so re-sampling every epoch does not reallocate
+                    out_xy = self._buf_X.get(k)
+                    out_val = self._buf_sol.get(k)
+                    if (out_xy is None) or (out_xy.shape[0] != pos.shape[0]) or (out_val.dtype != self.data_dict[k].dtype):
+                        out_xy = None
+                        out_val = None
+                    self.X[k], self.sol[k] = _gather_subsample(x_flat, y_flat, self.data_dict[k].ravel(), pos, out_xy=out_xy, out_val=out_val)
+                    self._buf_X[k] = self.X[k]
+                    self._buf_sol[k] = self.sol[k]
                 else:
                     # if the size is None, then only use boundary conditions
                     self.X[k] = X_bc
-                    self.sol[k] = self.data_dict[k][idbc].flatten()[:,None]
+                    self.sol[k] = self.data_dict[k].ravel()[idbc].reshape(-1,1)
 
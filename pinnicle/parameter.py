@@ -130,10 +130,14 @@ class SingleDataParameter(ParameterBase):
         self.name_map = {}
         # source of the data
         self.source = "ISSM"
+        # floating point precision to store the data, "float32" halves the memory traffic
+        self.dtype = "float64"
 
     def check_consistency(self):
         if self.source not in ["ISSM", "mat"]:
             raise ValueError(f"Data loader of {self.source} is not implemented")
+        if self.dtype not in ["float64", "float32"]:
+            raise ValueError(f"Data dtype {self.dtype} is not supported, use 'float64' or 'float32'")
 
     def __str__(self):
         """
@@ -1,4 +1,5 @@
 import os
+import numpy as np
 from pinnicle.modeldata import ISSMmdData, MatData, Data
 from pinnicle.parameter import DataParameter, SingleDataParameter
 
@@ -23,10 +24,30 @@ def test_ISSMmdData():
     assert(data_loader.sol['C'].shape == (564,1))
 
     iice = data_loader.get_ice_indices()
-    assert iice[0].shape == (23049,)
+    assert iice.shape == (23049,)
     icoord = data_loader.get_ice_coordinates()
     assert icoord.shape == (23049, 2)
 
+def test_ISSMmdData_float32():
+    filename = "Helheim_fastflow.mat"
+    repoPath = os.path.dirname(__file__) + "/../examples/"
+    appDataPath = os.path.join(repoPath, "dataset")
+    path = os.path.join(appDataPath, filename)
+
+    hp = {}
+    hp["data_path"] = path
+    hp["data_size"] = {"u":4000, "v":4000, "s":4000, "H":4000, "C":None}
+    hp["dtype"] = "float32"
+    p = SingleDataParameter(hp)
+    data_loader = ISSMmdData(p)
+    data_loader.load_data()
+    data_loader.prepare_training_data()
+
+    assert data_loader.data_dict['u'].dtype == np.float32
+    assert data_loader.sol['u'].dtype == np.float32
+    assert data_loader.sol['u'].shape == (4000,1)
+    assert data_loader.sol['C'].shape == (564,1)
+
 def test_ISSMmdData_plot():
     filename = "Helheim_fastflow.mat"
     repoPath = os.path.dirname(__file__) + "/../examples/"
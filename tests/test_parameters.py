@@ -29,11 +29,16 @@ def test_single_data_parameter():
     assert d.name_map["u"] == "u"
     assert d.name_map["v"] == "v"
     assert d.source == "mat"
+    assert d.dtype == "float64"
 
     with pytest.raises(Exception):
         unknown = {"source": "unknown"}
         d = SingleDataParameter(unknown)
 
+    with pytest.raises(Exception):
+        unknown = {"dtype": "float16"}
+        d = SingleDataParameter(unknown)
+
 def test_data_parameter():
     hp = {}
     issm = {"data_path":"./", "data_size":{"u":4000, "v":None}}